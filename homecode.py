@@ -2,6 +2,7 @@ import argparse
 import os
 import signal
 import sys
+from typing import Callable
 
 # Add src/ to path so agent.py, tools.py, etc. can do plain imports
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
@@ -11,7 +12,7 @@ from src.agent import Agent
 from src.config import load_config
 
 try:
-    from prompt_toolkit import prompt as pt_prompt
+    from prompt_toolkit import PromptSession
     from prompt_toolkit.auto_suggest import AutoSuggestFromHistory
     from prompt_toolkit.history import FileHistory
     from prompt_toolkit.key_binding import KeyBindings
@@ -32,30 +33,43 @@ SLASH_HELP = {
 }
 
 
-def handle_slash_command(cmd: str, agent: Agent) -> bool:
-    """Handle a slash command. Returns True if the command was recognized."""
-    lower = cmd.lower().strip()
+def _slash_exit(agent: Agent) -> bool:
+    display.print_info("Goodbye!")
+    sys.exit(0)
+
+
+def _slash_reset(agent: Agent) -> bool:
+    agent.reset()
+    display.print_info("Conversation history cleared.")
+    return True
+
+
+def _slash_model(agent: Agent) -> bool:
+    display.print_info(f"Model: {agent.config.model}  |  Host: {agent.config.base_url}")
+    return True
 
-    if lower in ("/exit", "/quit"):
-        display.print_info("Goodbye!")
-        sys.exit(0)
 
-    if lower == "/reset":
-        agent.reset()
-        display.print_info("Conversation history cleared.")
-        return True
+def _slash_help(agent: Agent) -> bool:
+    for name, desc in SLASH_HELP.items():
+        display.console.print(f"  [bold cyan]{name}[/bold cyan]  [dim]{desc}[/dim]")
+    return True
 
-    if lower == "/model":
-        display.print_info(f"Model: {agent.config.model}  |  Host: {agent.config.base_url}")
-        return True
 
-    if lower == "/help":
-        for name, desc in SLASH_HELP.items():
-            display.console.print(f"  [bold cyan]{name}[/bold cyan]  [dim]{desc}[/dim]")
-        return True
+_SLASH_DISPATCH: dict[str, Callable[[Agent], bool]] = {
+    "/exit":  _slash_exit,
+    "/quit":  _slash_exit,
+    "/reset": _slash_reset,
+    "/model": _slash_model,
+    "/help":  _slash_help,
+}
+
 
+def handle_slash_command(cmd: str, agent: Agent) -> bool:
+    """Handle a slash command (already stripped by get_user_input).
+    Returns True if the command was recognized."""
+    handler = _SLASH_DISPATCH.get(cmd.lower())
     # Unknown slash command — let the agent handle it as normal text
-    return False
+    return handler(agent) if handler else False
 
 
 # ── Input ─────────────────────────────────────────────────────────────────────
@@ -71,16 +85,28 @@ def _make_key_bindings() -> "KeyBindings":
     return kb
 
 
-def get_user_input(history_file: str) -> str:
-    """Read one line of user input, with history and auto-suggest if available."""
-    if HAS_PROMPT_TOOLKIT:
-        return pt_prompt(
-            "\n> ",
+# One prompt session per history file, reused across prompts
+_PROMPT_SESSIONS: dict[str, "PromptSession"] = {}
+
+
+def _get_prompt_session(history_file: str) -> "PromptSession":
+    """Build the history, auto-suggest and key bindings once and reuse them."""
+    session = _PROMPT_SESSIONS.get(history_file)
+    if session is None:
+        session = PromptSession(
             history=FileHistory(history_file),
             auto_suggest=AutoSuggestFromHistory(),
             key_bindings=_make_key_bindings(),
             multiline=False,
-        ).strip()
+        )
+        _PROMPT_SESSIONS[history_file] = session
+    return session
+
+
+def get_user_input(history_file: str) -> str:
+    """Read one line of user input, with history and auto-suggest if available."""
+    if HAS_PROMPT_TOOLKIT:
+        return _get_prompt_session(history_file).prompt("\n> ").strip()
     else:
         return input("\n> ").strip()
 
@@ -122,24 +148,28 @@ def main() -> None:
 
     signal.signal(signal.SIGINT, _sigint_handler)
 
-    while True:
-        try:
-            user_input = get_user_input(config.history_file)
-        except EOFError:
-            display.print_info("\nGoodbye!")
-            break
-
-        if not user_input:
-            continue
+    try:
+        while True:
+            try:
+                user_input = get_user_input(config.history_file)
+            except EOFError:
+                display.print_info("\nGoodbye!")
+                break
 
-        if user_input.startswith("/"):
-            if handle_slash_command(user_input, agent):
+            if not user_input:
                 continue
 
-        try:
-            agent.run(user_input)
-        except Exception as e:
-            display.print_error(f"Agent error: {e}")
+            if user_input[0] == "/":
+                if handle_slash_command(user_input, agent):
+                    continue
+
+            try:
+                agent.run(user_input)
+            except Exception as e:
+                display.print_error(f"Agent error: {e}")
+    finally:
+        # Also runs on /exit, which leaves through sys.exit()
+        agent.close()
 
 
 if __name__ == "__main__":
@@ -1,11 +1,24 @@
 import datetime
+import io
 import os
 import json
+import re
+from concurrent.futures import ThreadPoolExecutor
 
+import httpx
 from openai import OpenAI
 
+# orjson is an optional, faster drop-in for parsing large tool-call arguments.
+# Its JSONDecodeError subclasses json.JSONDecodeError, so error handling is shared.
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
 import display
 from config import Config
+from llm_cache import ResponseCache
 from tools import execute_tool
 
 # ── Tool definitions (OpenAI/Ollama format) ───────────────────────────────────
@@ -165,17 +178,18 @@ TOOL_DEFINITIONS = [
     },
 ]
 
+# The definitions never change, so serialize them once for request hashing
+TOOL_DEFINITIONS_JSON = json.dumps(TOOL_DEFINITIONS, sort_keys=True, separators=(",", ":"))
+
 
 # ── System prompt ─────────────────────────────────────────────────────────────
 
-def _build_system_prompt(config: Config) -> str:
-    return f"""You are HomeCode, an expert software engineering assistant running locally.
+# Everything that never changes comes first and is byte-identical across
+# sessions, so provider-side prompt (prefix) caching can reuse it. Only the
+# environment lines at the end vary.
+_STATIC_SYSTEM_PREFIX = """You are HomeCode, an expert software engineering assistant running locally.
 You help users write, read, edit, and understand code.
 
-Current working directory: {config.working_dir}
-Date: {datetime.date.today().isoformat()}
-OS: {os.uname().sysname} {os.uname().machine}
-
 ## Available tools
 - read_file: Read file contents with line numbers
 - write_file: Write or create a file
@@ -195,118 +209,280 @@ OS: {os.uname().sysname} {os.uname().machine}
 """
 
 
+# Host info is constant for the life of the process
+_UNAME = os.uname()
+_OS_TAG = f"{_UNAME.sysname} {_UNAME.machine}"
+
+
+def _build_system_prompt(config: Config, date: datetime.date) -> str:
+    return _STATIC_SYSTEM_PREFIX + f"""
+## Environment
+Current working directory: {config.working_dir}
+Date: {date.isoformat()}
+OS: {_OS_TAG}
+"""
+
+
 # ── Agent ─────────────────────────────────────────────────────────────────────
 
+# Tools with no side effects; a batch made only of these can run concurrently
+PARALLEL_SAFE_TOOLS = frozenset({"read_file", "grep", "glob"})
+
+# Tool results larger than this are elided once they are no longer recent
+TOOL_RESULT_ELIDE_CHARS = 2048
+
+# After this many user turns without any tool use, stop sending the tool
+# definitions until the user asks for something that looks like file work
+TOOL_IDLE_TURNS = 3
+_TOOL_HINT = re.compile(
+    r"[/\\]|\.\w{1,4}\b|\b(read|write|edit|run|fix|file|files|grep|search|find|test|tests|bash|command)\b",
+    re.IGNORECASE,
+)
+
+
 class Agent:
     def __init__(self, config: Config) -> None:
         self.config = config
-        self.messages: list[dict] = []  # Full conversation history
+        # The system prompt only depends on the working dir, date and OS,
+        # so render it once and only again when one of those changes
+        self._session_date = datetime.date.today()
+        self._system_msg = self._render_system_msg()
+        # Full conversation history; the system message always stays at index 0
+        self.messages: list[dict] = [self._system_msg]
+        # LLM calls made this session, and (message index, call number) of each
+        # tool result still sent in full
+        self._iteration = 0
+        self._tool_results: list[tuple[int, int]] = []
+        # User turns since the last reset, and whether any of them used a tool
+        self._turns = 0
+        self._tools_used = False
+        # The SDK's own pool drops idle connections after 5 s; keep them for two
+        # minutes so the next call after a slow tool or a pause between turns
+        # does not open a new connection (and TLS handshake)
+        self._http = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=100, max_keepalive_connections=20, keepalive_expiry=120.0
+            ),
+            timeout=httpx.Timeout(600.0, connect=5.0),
+            follow_redirects=True,
+        )
         self.client = OpenAI(
             base_url=config.base_url,
             api_key=config.api_key,
+            http_client=self._http,
+        )
+        # Worker threads for running independent read-only tool calls in parallel
+        self._pool = ThreadPoolExecutor(max_workers=8)
+        self._cache = (
+            ResponseCache(config.cache_dir, config.cache_ttl) if config.cache_enabled else None
         )
 
+    def close(self) -> None:
+        """Release the HTTP connection pool and the tool worker threads."""
+        self._http.close()
+        self._pool.shutdown(wait=False)
+
     def reset(self) -> None:
-        """Clear conversation history."""
-        self.messages = []
+        """Clear conversation history, keeping only the system prompt."""
+        self.messages = [self._system_msg]
+        self._tool_results = []
+        self._turns = 0
+        self._tools_used = False
+
+    def set_working_dir(self, working_dir: str) -> None:
+        """Change the working directory and re-render the cached system prompt."""
+        self.config.working_dir = working_dir
+        self._system_msg = self.messages[0] = self._render_system_msg()
+
+    def _render_system_msg(self) -> dict:
+        return {
+            "role": "system",
+            "content": _build_system_prompt(self.config, self._session_date),
+        }
+
+    def _refresh_system_date(self) -> None:
+        """Re-render the system prompt if the session has crossed midnight."""
+        today = datetime.date.today()
+        if today != self._session_date:
+            self._session_date = today
+            self._system_msg = self.messages[0] = self._render_system_msg()
 
     def run(self, user_input: str) -> None:
         """Send user input to the LLM and execute any tool calls it returns.
         Loops until the model produces a plain text reply or the iteration cap is hit."""
+        # Checked once per user turn, not on every tool-loop iteration
+        self._refresh_system_date()
         self.messages.append({"role": "user", "content": user_input})
+        send_tools = self._wants_tools(user_input)
         iteration = 0
 
         # Agentic loop: keep calling the LLM until it stops requesting tools
         while iteration < self.config.max_tool_iterations:
             iteration += 1
+            self._iteration += 1
+            self._elide_old_tool_results()
 
-            content_buffer: list[str] = []
+            content_buf = io.StringIO()
             tool_calls_received = []
 
             display.start_assistant_response()
 
+            # Replay a cached final reply for an identical request
+            cache_key = None
+            if self._cache is not None:
+                cache_key = self._cache.key(
+                    self.config.model, self.messages, TOOL_DEFINITIONS_JSON if send_tools else ""
+                )
+                cached = self._cache.get(cache_key)
+                if cached is not None:
+                    self.messages.append(cached)
+                    display.render_markdown_response(cached["content"])
+                    return
+
+            request = {
+                "model": self.config.model,
+                # The history starts with the system prompt, so it is sent as is
+                "messages": self.messages,
+                "stream": True,
+            }
+            if send_tools:
+                request["tools"] = TOOL_DEFINITIONS
+
             try:
                 # OpenRouter / OpenAI chat completion (streaming)
-                response = self.client.chat.completions.create(
-                    model=self.config.model,
-                    messages=self._build_api_messages(),
-                    tools=TOOL_DEFINITIONS,
-                    stream=True,
-                )
+                response = self.client.chat.completions.create(**request)
             except Exception as e:
                 display.print_error(f"LLM call failed: {e}")
                 return
 
             # Accumulate streaming chunks into a single message
             current_assistant_message = {"role": "assistant", "content": "", "tool_calls": []}
-
-            for chunk in response:
-                delta = chunk.choices[0].delta
-
-                if delta.content:
-                    content_buffer.append(delta.content)
-
-                if delta.tool_calls:
-                    # Build tool call objects incrementally from deltas
-                    for tc_delta in delta.tool_calls:
-                        if len(current_assistant_message["tool_calls"]) <= tc_delta.index:
-                            current_assistant_message["tool_calls"].append({
-                                "id": tc_delta.id,
-                                "type": "function",
-                                "function": {"name": "", "arguments": ""}
-                            })
-
-                        tc = current_assistant_message["tool_calls"][tc_delta.index]
-                        if tc_delta.function.name:
-                            tc["function"]["name"] += tc_delta.function.name
-                        if tc_delta.function.arguments:
-                            tc["function"]["arguments"] += tc_delta.function.arguments
-
-            content_text = "".join(content_buffer)
-            current_assistant_message["content"] = content_text
-            tool_calls_received = current_assistant_message["tool_calls"]
+            # Tool calls keyed by their stream index; fragments are collected in
+            # lists because repeated str += is quadratic for large arguments
+            tc_map: dict[int, dict] = {}
+
+            with display.stream_markdown_response() as write_content:
+                for chunk in response:
+                    # Some providers send keep-alive/usage chunks with no choices
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta
+
+                    text = delta.content
+                    if text:
+                        content_buf.write(text)
+                        # Show text as it arrives instead of after the whole reply
+                        write_content(text)
+
+                    if delta.tool_calls:
+                        # Build tool call objects incrementally from deltas
+                        for tc_delta in delta.tool_calls:
+                            tc = tc_map.get(tc_delta.index)
+                            if tc is None:
+                                tc = tc_map[tc_delta.index] = {
+                                    "id": tc_delta.id, "_name": [], "_args": []
+                                }
+                            fn_delta = tc_delta.function
+                            if fn_delta.name:
+                                tc["_name"].append(fn_delta.name)
+                            if fn_delta.arguments:
+                                tc["_args"].append(fn_delta.arguments)
+
+            current_assistant_message["content"] = content_buf.getvalue()
+
+            # Materialize the streamed fragments, in index order, into the API shape
+            tool_calls_received = current_assistant_message["tool_calls"] = [
+                {
+                    "id": tc["id"],
+                    "type": "function",
+                    "function": {
+                        "name": "".join(tc["_name"]),
+                        "arguments": "".join(tc["_args"]),
+                    },
+                }
+                for _, tc in sorted(tc_map.items())
+            ]
 
             if tool_calls_received:
+                self._tools_used = True
                 # Save the assistant message that contains the tool call requests
                 self.messages.append(current_assistant_message)
 
                 # Run each requested tool and append the result to the history
-                for tc in tool_calls_received:
-                    fn_name = tc["function"]["name"]
-                    try:
-                        fn_args = json.loads(tc["function"]["arguments"])
-                    except json.JSONDecodeError:
-                        fn_args = {}
-
-                    display.print_tool_call(fn_name, fn_args)
-
-                    result = execute_tool(fn_name, fn_args, self.config)
-                    is_error = result.startswith("Error:")
-                    display.print_tool_result(result, fn_name, is_error=is_error)
+                for tc, fn_name, result in self._run_tool_calls(tool_calls_received):
+                    display.print_tool_result(result.content, fn_name, is_error=not result.ok)
 
                     # Tool results must be linked to the tool call by ID
                     self.messages.append({
                         "role": "tool",
                         "tool_call_id": tc["id"],
                         "name": fn_name,
-                        "content": result
+                        "content": result.content
                     })
+                    self._tool_results.append((len(self.messages) - 1, self._iteration))
 
                 # Feed results back to the LLM in the next iteration
                 continue
 
             else:
-                # No tool calls: the model is done, render its text reply
+                # No tool calls: the model is done; its reply was rendered while streaming
                 self.messages.append(current_assistant_message)
-                display.render_markdown_response(content_text)
+                if cache_key is not None:
+                    self._cache.set(cache_key, current_assistant_message)
                 return
 
         display.print_iteration_limit(self.config.max_tool_iterations)
 
-    def _build_api_messages(self) -> list[dict]:
-        """Prepend the system prompt to the conversation history for each API call."""
-        system_msg = {
-            "role": "system",
-            "content": _build_system_prompt(self.config),
-        }
-        return [system_msg] + self.messages
+    def _wants_tools(self, user_input: str) -> bool:
+        """Decide whether to send the tool definitions for this user turn.
+        Tools are only dropped in a pure-chat session (no tool use since the
+        last reset), since some providers reject tool history without them."""
+        idle = not self._tools_used and self._turns >= TOOL_IDLE_TURNS
+        self._turns += 1
+        return not idle or bool(_TOOL_HINT.search(user_input))
+
+    def _elide_old_tool_results(self) -> None:
+        """Replace large tool outputs the model has already seen for
+        config.tool_result_keep_full calls with a short placeholder,
+        so old file dumps are not re-sent on every iteration."""
+        recent = []
+        for index, produced_at in self._tool_results:
+            if self._iteration - produced_at <= self.config.tool_result_keep_full:
+                recent.append((index, produced_at))
+                continue
+            msg = self.messages[index]
+            size = len(msg["content"])
+            if size > TOOL_RESULT_ELIDE_CHARS:
+                msg["content"] = (
+                    f"[elided: {size} chars of {msg['name']} output from iteration "
+                    f"{produced_at}; run the tool again if you need it]"
+                )
+        self._tool_results = recent
+
+    def _run_tool_calls(self, tool_calls: list[dict]):
+        """Execute tool calls, yielding (tool_call, name, ToolResult) in request order.
+        Batches made only of read-only tools run concurrently on the thread pool."""
+        parsed = []
+        for tc in tool_calls:
+            try:
+                # Tools that take no parameters may stream no argument text at all
+                fn_args = _json_loads(tc["function"]["arguments"] or "{}")
+            except json.JSONDecodeError:
+                fn_args = {}
+            parsed.append((tc, tc["function"]["name"], fn_args))
+
+        if len(parsed) > 1 and all(name in PARALLEL_SAFE_TOOLS for _, name, _ in parsed):
+            for _, fn_name, fn_args in parsed:
+                display.print_tool_call(fn_name, fn_args)
+            futures = [
+                self._pool.submit(execute_tool, fn_name, fn_args, self.config)
+                for _, fn_name, fn_args in parsed
+            ]
+            for (tc, fn_name, _), future in zip(parsed, futures):
+                yield tc, fn_name, future.result()
+            return
+
+        # Anything that may write (write_file, edit_file, bash) runs one at a time
+        for tc, fn_name, fn_args in parsed:
+            display.print_tool_call(fn_name, fn_args)
+            yield tc, fn_name, execute_tool(fn_name, fn_args, self.config)
@@ -17,6 +17,12 @@ class Config:
     max_tool_iterations: int = 20
     bash_timeout: int = 30
     working_dir: str = ""
+    tool_result_keep_full: int = 3
+
+    # Response cache (exact-match, final replies only)
+    cache_enabled: bool = False
+    cache_ttl: int = 86400
+    cache_dir: str = ""
 
     # REPL
     history_file: str = ""
@@ -31,5 +37,9 @@ def load_config() -> Config:
         max_tool_iterations=int(os.environ.get("HOMECODE_MAX_ITER", "20")),
         bash_timeout=int(os.environ.get("HOMECODE_BASH_TIMEOUT", "30")),
         working_dir=os.environ.get("HOMECODE_WORKDIR", str(Path.cwd())),
+        tool_result_keep_full=int(os.environ.get("HOMECODE_KEEP_TOOL_RESULTS", "3")),
+        cache_enabled=os.environ.get("HOMECODE_CACHE", "0") == "1",
+        cache_ttl=int(os.environ.get("HOMECODE_CACHE_TTL", "86400")),
+        cache_dir=str(Path.home() / ".homecode_cache"),
         history_file=str(Path.home() / ".homecode_history"),
     )
@@ -1,5 +1,8 @@
+import functools
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
 from rich.console import Console
-from rich.markdown import Markdown
 from rich.panel import Panel
 from rich.text import Text
 from rich.rule import Rule
@@ -13,9 +16,13 @@ THEME = Theme({
     "info": "dim white",
 })
 
-# Main console for stdout; err_console writes to stderr
+# Main console for stdout; the stderr console is created on first error
 console = Console(theme=THEME, highlight=False)
-err_console = Console(stderr=True, theme=THEME)
+
+
+@functools.cache
+def _err_console() -> Console:
+    return Console(stderr=True, theme=THEME)
 
 
 def print_banner(model: str, host: str, workdir: str) -> None:
@@ -42,28 +49,48 @@ def print_tool_call(tool_name: str, arguments: dict) -> None:
     text = Text()
     text.append(f"  {tool_name}", style="tool.name")
     for key, val in arguments.items():
-        val_str = str(val)
-        # Truncate long values so the line stays readable
-        if len(val_str) > 80:
-            val_str = val_str[:77] + "..."
+        # Truncate long values so the line stays readable; strings are sliced
+        # directly so large write_file content is never copied in full
+        if isinstance(val, str):
+            val_str = val if len(val) <= 80 else val[:77] + "..."
+        else:
+            val_str = str(val)
+            if len(val_str) > 80:
+                val_str = val_str[:77] + "..."
         text.append(f"  {key}=", style="dim")
         text.append(val_str, style="tool.arg")
     console.print(text)
 
 
+# Line boundaries str.splitlines() recognises besides "\n"
+_OTHER_LINE_BREAKS = ("\r", "\x0b", "\x0c", "\x1c", "\x1d", "\x1e", "\x85", "\u2028", "\u2029")
+
+
+def _head_lines(text: str, n: int) -> tuple[str, int]:
+    """Return the first n lines of text and the number of lines left out,
+    counting lines the way str.splitlines() does. When "\n" is the only line
+    break, only scans up to the nth newline, so huge outputs are never split."""
+    if any(c in text for c in _OTHER_LINE_BREAKS):
+        # e.g. the bare "\r" pip, curl and git use to redraw progress lines;
+        # splitlines() is the reference and is faster than counting each break
+        lines = text.splitlines()
+        return "\n".join(lines[:n]), max(0, len(lines) - n)
+    pos = -1
+    for _ in range(n):
+        pos = text.find("\n", pos + 1)
+        if pos < 0:
+            return text.removesuffix("\n"), 0
+    if pos + 1 == len(text):
+        return text[:pos], 0
+    remaining = text.count("\n", pos + 1) + (0 if text.endswith("\n") else 1)
+    return text[:pos], remaining
+
+
 def print_tool_result(result: str, tool_name: str, is_error: bool = False) -> None:
     """Print the result of a tool call in a bordered panel, capped at 25 lines."""
-    lines = result.splitlines()
-    truncated = False
-    if len(lines) > 25:
-        shown = lines[:25]
-        truncated = True
-    else:
-        shown = lines
-
-    display_text = "\n".join(shown)
-    if truncated:
-        display_text += f"\n[dim]... ({len(lines) - 25} more lines)[/dim]"
+    display_text, hidden = _head_lines(result, 25)
+    if hidden:
+        display_text += f"\n[dim]... ({hidden} more lines)[/dim]"
 
     border = "red" if is_error else "dim green"
     style = "tool.error" if is_error else "tool.result"
@@ -80,15 +107,64 @@ def start_assistant_response() -> None:
     console.print(Rule(style="dim"))
 
 
+class _MarkdownStream:
+    """Renderable holding streamed text; Markdown is parsed only when Live refreshes.
+    Tokens that arrive between refreshes are coalesced into a single re-parse,
+    and refreshes with no new tokens reuse the previous parse."""
+
+    def __init__(self) -> None:
+        self.parts: list[str] = []
+        self._parsed_parts = 0
+        self._markdown = None
+
+    def __rich_console__(self, console, options):
+        count = len(self.parts)
+        if self._markdown is None or count != self._parsed_parts:
+            # rich.markdown pulls in pygments; import it only once a reply is rendered
+            from rich.markdown import Markdown
+            self._markdown = Markdown("".join(self.parts[:count]))
+            self._parsed_parts = count
+        yield self._markdown
+
+
+@contextmanager
+def stream_markdown_response() -> Iterator[Callable[[str], None]]:
+    """Render the assistant reply as Markdown while it streams in.
+    Yields a write(text) callback; the live region starts on the first write.
+    When stdout is not a terminal the reply is printed once at the end."""
+    from rich.live import Live
+
+    stream = _MarkdownStream()
+    live = Live(stream, console=console, refresh_per_second=12)
+    started = False
+
+    def write(text: str) -> None:
+        nonlocal started
+        if not started and console.is_terminal:
+            live.start()
+            started = True
+        stream.parts.append(text)
+
+    try:
+        yield write
+    finally:
+        # Stopping triggers a final refresh with the complete text
+        if started:
+            live.stop()
+        elif "".join(stream.parts).strip():
+            console.print(stream)
+
+
 def render_markdown_response(content: str) -> None:
     """Render the final assistant reply as formatted Markdown."""
     if content.strip():
+        from rich.markdown import Markdown
         console.print(Markdown(content))
 
 
 def print_error(message: str) -> None:
     """Print an error message to stderr."""
-    err_console.print(f"[bold red]Error:[/bold red] {message}")
+    _err_console().print(f"[bold red]Error:[/bold red] {message}")
 
 
 def print_info(message: str) -> None:
@@ -0,0 +1,63 @@
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+# orjson, when installed, is a faster serializer for hashing and storing entries
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class ResponseCache:
+    """Exact-match on-disk cache of final assistant replies.
+
+    Entries are keyed by a hash of the model, the full message history and the
+    tool definitions, and stored as one JSON file per key. Only replies that
+    requested no tools are cached, since tool turns have side effects."""
+
+    def __init__(self, path: str, ttl: int) -> None:
+        self.path = Path(path).expanduser()
+        self.ttl = ttl
+
+    def key(self, model: str, messages: list[dict], tools_json: str) -> str:
+        """Return a stable hash identifying this exact request.
+        tools_json is the tool definitions, serialized once by the caller."""
+        request = {"model": model, "messages": messages}
+        if orjson is not None:
+            payload = orjson.dumps(request, option=orjson.OPT_SORT_KEYS)
+        else:
+            payload = json.dumps(request, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        digest = hashlib.sha256(payload)
+        digest.update(tools_json.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        """Return the cached assistant message, or None on a miss or expired entry."""
+        entry = self.path / f"{key}.json"
+        try:
+            if self.ttl > 0 and time.time() - entry.stat().st_mtime > self.ttl:
+                return None
+            data = entry.read_bytes()
+            return orjson.loads(data) if orjson is not None else json.loads(data)
+        except (OSError, ValueError):
+            # A missing or corrupt entry is just a miss
+            return None
+
+    def set(self, key: str, message: dict) -> None:
+        """Store an assistant message; failures are ignored so caching never breaks a turn."""
+        entry = self.path / f"{key}.json"
+        tmp = entry.with_suffix(".tmp")
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            if orjson is not None:
+                tmp.write_bytes(orjson.dumps(message))
+            else:
+                tmp.write_text(json.dumps(message), encoding="utf-8")
+            # Rename so a concurrent reader never sees a half-written entry
+            os.replace(tmp, entry)
+        except OSError:
+            pass
@@ -1,8 +1,24 @@
+import base64
+import fnmatch
+import functools
+import itertools
+import json
+import mmap
+import multiprocessing
 import os
 import re
+import shlex
+import shutil
+import signal
+import stat
 import subprocess
+import tempfile
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional
 
 from config import Config
 
@@ -11,15 +27,600 @@ class ToolError(Exception):
     pass
 
 
+@dataclass
+class ToolResult:
+    """Outcome of a tool call: ok is False when the tool failed, content is sent to the model."""
+    ok: bool
+    content: str
+
+
 # ── Helpers ──────────────────────────────────────────────────────────────────
 
+# ripgrep, if installed, is used as a much faster grep backend
+_RG = shutil.which("rg")
+
+# Binary and generated file types that grep skips when walking a tree
+_SKIP_EXTS = frozenset({
+    ".pyc", ".so", ".o", ".jpg", ".jpeg", ".png", ".gif",
+    ".pdf", ".zip", ".tar", ".gz", ".exe", ".bin", ".whl",
+})
+# The same set as a tuple, so one str.endswith call tests every extension in C
+_SKIP_SUFFIXES = tuple(sorted(_SKIP_EXTS))
+
+
 def _resolve_path(path: str, config: Optional[Config]) -> str:
     """Return an absolute path, resolving relative paths against the working directory."""
-    p = Path(path)
-    if p.is_absolute():
-        return str(p)
-    cwd = Path(config.working_dir) if config else Path.cwd()
-    return str((cwd / p).resolve())
+    if os.path.isabs(path):
+        return str(Path(path))
+    cwd = config.working_dir if config else os.getcwd()
+    # Resolved on every call rather than cached: symlinks along the path can
+    # change between calls. os.path.realpath is what Path.resolve() runs,
+    # without building the intermediate Path objects.
+    return os.path.realpath(os.path.join(cwd, path))
+
+
+_COUNT_CHUNK = 1 << 20
+
+
+def _count_newlines(data, start: int = 0, end: Optional[int] = None) -> int:
+    """Count newlines in data[start:end] for a str, bytes or mmap buffer.
+    mmap has no count(), so it is counted in C over 1 MiB slices."""
+    if end is None:
+        end = len(data)
+    if not isinstance(data, mmap.mmap):
+        return data.count("\n" if isinstance(data, str) else b"\n", start, end)
+    total = 0
+    for i in range(start, end, _COUNT_CHUNK):
+        total += data[i:min(i + _COUNT_CHUNK, end)].count(b"\n")
+    return total
+
+
+# Files smaller than this are read outright; mapping them costs more than it saves
+_MMAP_MIN_SIZE = 256 * 1024
+
+
+def _read_buffer(f) -> "bytes | mmap.mmap":
+    """Return the contents of a file opened in binary mode. Large files are
+    mapped read-only with a sequential-access hint instead of being copied;
+    the caller must close the mmap. Files that report size 0 (e.g. under
+    /proc) are read normally."""
+    if os.fstat(f.fileno()).st_size < _MMAP_MIN_SIZE:
+        return f.read()
+    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(mmap, "MADV_SEQUENTIAL"):
+        data.madvise(mmap.MADV_SEQUENTIAL)
+    return data
+
+
+_SEEK_BLOCK = 1 << 16
+
+
+def _line_offset(data, lines: int, pos: int = 0) -> int:
+    """Return the byte offset reached by skipping `lines` lines from pos in a
+    bytes or mmap buffer (len(data) if it runs out). Whole blocks are skipped
+    by counting their newlines in C; only the last block is searched newline
+    by newline."""
+    size = len(data)
+    remaining = lines
+    while remaining and pos < size:
+        end = min(pos + _SEEK_BLOCK, size)
+        count = _count_newlines(data, pos, end)
+        if count >= remaining:
+            break
+        remaining -= count
+        pos = end
+    for _ in range(remaining):
+        nl = data.find(b"\n", pos)
+        if nl < 0:
+            return size
+        pos = nl + 1
+    return pos
+
+
+def _count_lines(data) -> int:
+    """Count lines in a bytes or mmap buffer without splitting it."""
+    total = _count_newlines(data)
+    if data and data[-1:] != b"\n":
+        total += 1
+    return total
+
+
+def _walk_files(root: str, skip_suffixes: tuple[str, ...],
+                dirs: Optional[list] = None) -> Iterator[str]:
+    """Yield paths of files under root, pruning hidden directories (e.g. .git,
+    .venv) before descending and skipping unwanted extensions by name.
+    os.scandir reuses the type info from readdir, so no extra stat per file.
+    An explicit stack avoids nested generators and the recursion limit.
+    If dirs is given, (path, mtime_ns) of each directory listed is appended."""
+    stack = [root]
+    while stack:
+        top = stack.pop()
+        try:
+            if dirs is not None:
+                # Stat before listing, so a file added in between changes the mtime
+                dirs.append((top, os.stat(top).st_mtime_ns))
+            with os.scandir(top) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if not entry.name.startswith("."):
+                            stack.append(entry.path)
+                    elif not entry.name.endswith(skip_suffixes) and entry.is_file():
+                        yield entry.path
+        except OSError:
+            continue
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_glob(pattern: str) -> Optional[re.Pattern]:
+    """Compile a glob that matches a single file name, once per unique pattern.
+    Returns None for patterns with path separators or "**", which are left
+    to pathlib."""
+    if "/" in pattern or "**" in pattern or pattern in ("", ".", ".."):
+        return None
+    return re.compile(fnmatch.translate(pattern))
+
+
+def _walk_glob(root: str, name_re: re.Pattern, dirs: Optional[list] = None) -> Iterator[str]:
+    """Yield paths of files under root whose name matches name_re.
+    Like Path.rglob, hidden directories are searched and symlinked ones are not.
+    dirs collects (path, mtime_ns) of each directory listed, as in _walk_files."""
+    stack = [root]
+    while stack:
+        top = stack.pop()
+        try:
+            if dirs is not None:
+                dirs.append((top, os.stat(top).st_mtime_ns))
+            with os.scandir(top) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif name_re.match(entry.name) and not entry.is_dir():
+                        yield entry.path
+        except OSError:
+            continue
+
+
+def _path_key(path: str) -> list[str]:
+    """Sort key giving the same order as comparing Path objects, but computed
+    and compared in C."""
+    return path.split(os.sep)
+
+
+def _list_candidates(base_path: Path, glob_pattern: Optional[str],
+                     dirs: Optional[list] = None) -> list[str]:
+    """List the files grep should scan under a directory, sorted by path.
+    dirs, if given, collects the directories listed; it is left empty for
+    patterns handled by pathlib, which does not report them."""
+    if glob_pattern:
+        name_re = _compile_glob(glob_pattern)
+        if name_re is None:
+            files = list(map(str, base_path.rglob(glob_pattern)))
+        else:
+            files = list(_walk_glob(str(base_path), name_re, dirs))
+    else:
+        files = list(_walk_files(str(base_path), _SKIP_SUFFIXES, dirs))
+    # Sorted once here, so repeat greps over a cached list skip the sort
+    files.sort(key=_path_key)
+    return files
+
+
+# Candidate lists from earlier greps this session, keyed by (directory, glob).
+# Each entry records the mtime of every directory that was listed, and is
+# reused only while all of them are unchanged: creating, deleting or renaming
+# a file anywhere below the root, by the agent or by the user, invalidates it.
+# Only the most recently used few are kept.
+_FILE_LIST_CACHE_SIZE = 8
+_FILE_LIST_CACHE: "OrderedDict[tuple[str, Optional[str]], tuple[list[tuple[str, int]], list[str]]]" = OrderedDict()
+
+
+def _dirs_unchanged(dirs: list[tuple[str, int]]) -> bool:
+    try:
+        return all(os.stat(path).st_mtime_ns == mtime for path, mtime in dirs)
+    except OSError:
+        return False
+
+
+def _cached_candidates(base_path: Path, glob_pattern: Optional[str]) -> list[str]:
+    """Return the candidate file list, re-walking the tree only when a directory
+    below the root has changed. Re-statting the directories is much cheaper
+    than listing them again."""
+    key = (str(base_path), glob_pattern)
+    cached = _FILE_LIST_CACHE.get(key)
+    if cached is not None and _dirs_unchanged(cached[0]):
+        _FILE_LIST_CACHE.move_to_end(key)
+        return cached[1]
+
+    dirs: list[tuple[str, int]] = []
+    files = _list_candidates(base_path, glob_pattern, dirs)
+    _FILE_LIST_CACHE.pop(key, None)
+    if dirs:
+        _FILE_LIST_CACHE[key] = (dirs, files)
+        if len(_FILE_LIST_CACHE) > _FILE_LIST_CACHE_SIZE:
+            _FILE_LIST_CACHE.popitem(last=False)
+    return files
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_grep_pattern(pattern: str) -> "re.Pattern":
+    """Compile pattern for line-by-line searching, once per unique pattern."""
+    try:
+        return re.compile(pattern)
+    except re.error as e:
+        raise ToolError(f"Invalid regex pattern: {e}")
+
+
+# re's own pattern parser; it was the public sre_parse module before 3.11
+try:
+    from re import _parser as _re_parser
+except ImportError:
+    import sre_parse as _re_parser
+
+# Shortest literal worth a separate substring pass before the regex scan
+_MIN_PREFILTER_LITERAL = 3
+
+
+@functools.lru_cache(maxsize=256)
+def _required_literal(regex: "re.Pattern"):
+    """Return the longest run of plain characters every match must contain, as
+    str or bytes to match the pattern, or None if there is no useful one.
+    Only top-level literals are considered: each of them is required, unlike
+    anything inside an alternation or an optional repeat."""
+    if regex.flags & re.IGNORECASE:
+        return None
+    try:
+        # re's parser is internal, so any surprise just disables the prefilter
+        parsed = _re_parser.parse(regex.pattern, regex.flags)
+    except Exception:
+        return None
+
+    best: list[int] = []
+    run: list[int] = []
+    for op, av in parsed.data:
+        if op is _re_parser.LITERAL:
+            run.append(av)
+            if len(run) > len(best):
+                best = list(run)
+        else:
+            run = []
+    if len(best) < _MIN_PREFILTER_LITERAL:
+        return None
+    if isinstance(regex.pattern, bytes):
+        return bytes(best)
+    return "".join(map(chr, best))
+
+
+# How closely a str pattern compiled as UTF-8 bytes keeps its meaning
+_BYTES_NEVER = 0        # different lines may match
+_BYTES_ASCII_TEXT = 1   # same lines on pure-ASCII text, e.g. "." or \w match one byte
+_BYTES_ANY_TEXT = 2     # same lines on any UTF-8 text
+
+_REPEAT_OPS = tuple(
+    getattr(_re_parser, name)
+    for name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT")
+    if hasattr(_re_parser, name)
+)
+
+
+def _ascii_set(items) -> bool:
+    """True if a parsed character set lists only ASCII characters (it may be negated)."""
+    return all(
+        op is _re_parser.NEGATE
+        or (op is _re_parser.LITERAL and av < 128)
+        or (op is _re_parser.RANGE and av[1] < 128)
+        for op, av in items
+    )
+
+
+# Character classes that include "\n"
+_NEWLINE_CATEGORIES = tuple(
+    getattr(_re_parser, name)
+    for name in ("CATEGORY_SPACE", "CATEGORY_NOT_DIGIT", "CATEGORY_NOT_WORD", "CATEGORY_LINEBREAK")
+)
+
+
+def _set_has_newline(items) -> bool:
+    """True if a parsed character set matches "\n"."""
+    p = _re_parser
+    listed = any(
+        (op is p.LITERAL and av == 10)
+        or (op is p.RANGE and av[0] <= 10 <= av[1])
+        or (op is p.CATEGORY and av in _NEWLINE_CATEGORIES)
+        for op, av in items
+    )
+    return listed != any(op is p.NEGATE for op, _ in items)
+
+
+def _matches_newline(items, dotall: bool) -> bool:
+    """True if any character the parsed pattern consumes can be "\n"."""
+    p = _re_parser
+    for op, av in items:
+        if op is p.ANY:
+            found = dotall
+        elif op is p.LITERAL:
+            found = av == 10
+        elif op is p.NOT_LITERAL:
+            found = av != 10
+        elif op is p.IN:
+            found = _set_has_newline(av)
+        elif op in _REPEAT_OPS:
+            found = _matches_newline(av[2], dotall)
+        elif op is p.SUBPATTERN:
+            _, add_flags, del_flags, body = av
+            found = _matches_newline(body, bool((dotall or add_flags & re.DOTALL)
+                                                and not del_flags & re.DOTALL))
+        elif op is p.BRANCH:
+            found = any(_matches_newline(body, dotall) for body in av[1])
+        elif op is p.ASSERT or op is p.ASSERT_NOT:
+            found = _matches_newline(av[1], dotall)
+        elif op is getattr(p, "ATOMIC_GROUP", None):
+            found = _matches_newline(av, dotall)
+        else:
+            found = False
+        if found:
+            return True
+    return False
+
+
+def _bytes_fidelity(items, ignorecase: bool, dotall: bool) -> int:
+    """Rate a parsed pattern for whole-file bytes scanning (see _BYTES_*)."""
+    p = _re_parser
+    level = _BYTES_ASCII_TEXT if ignorecase else _BYTES_ANY_TEXT
+    for op, av in items:
+        if op is p.LITERAL or op is p.NOT_LITERAL:
+            # A non-ASCII character becomes several bytes, which quantifiers,
+            # sets and negation would then treat one by one
+            if av >= 128:
+                return _BYTES_NEVER
+            if op is p.NOT_LITERAL:
+                level = _BYTES_ASCII_TEXT
+        elif op is p.ANY:
+            level = _BYTES_ASCII_TEXT
+        elif op is p.IN:
+            if any((iop is p.LITERAL and iav >= 128) or (iop is p.RANGE and iav[1] >= 128)
+                   for iop, iav in av):
+                return _BYTES_NEVER
+            # A set matches one character, which is one byte only when the set is
+            # plain ASCII and not negated
+            if not _ascii_set(av) or any(iop is p.NEGATE for iop, _ in av):
+                level = _BYTES_ASCII_TEXT
+        elif op is p.AT:
+            if av is p.AT_BOUNDARY:
+                level = _BYTES_ASCII_TEXT
+            elif av not in (p.AT_BEGINNING, p.AT_BEGINNING_LINE, p.AT_END, p.AT_END_LINE):
+                # \A and \Z mean the start and end of each line, not of the file,
+                # and \B never matches an empty line
+                return _BYTES_NEVER
+        elif op in _REPEAT_OPS:
+            lo, hi, body = av
+            if _matches_newline(body, dotall):
+                # The repeat would run on past the end of the line, so every failed
+                # attempt rescans the rest of the file: quadratic when the rest of
+                # the pattern rarely matches
+                return _BYTES_NEVER
+            if (lo == 0 and hi == p.MAXREPEAT and len(body) == 1
+                    and (body[0][0] is p.ANY or body[0][0] is p.NOT_LITERAL
+                         or (body[0][0] is p.IN and _ascii_set(body[0][1])))):
+                # Between two character boundaries, any run of bytes other than
+                # some ASCII ones is a run of whole characters other than them
+                continue
+            level = min(level, _bytes_fidelity(body, ignorecase, dotall))
+        elif op is p.SUBPATTERN:
+            _, add_flags, del_flags, body = av
+            level = min(level, _bytes_fidelity(
+                body,
+                bool((ignorecase or add_flags & re.IGNORECASE) and not del_flags & re.IGNORECASE),
+                bool((dotall or add_flags & re.DOTALL) and not del_flags & re.DOTALL),
+            ))
+        elif op is p.BRANCH:
+            for body in av[1]:
+                level = min(level, _bytes_fidelity(body, ignorecase, dotall))
+        elif op is p.ASSERT or op is p.ASSERT_NOT:
+            if _matches_newline(av[1], dotall):
+                # Would look into the neighbouring line
+                return _BYTES_NEVER
+            level = min(level, _bytes_fidelity(av[1], ignorecase, dotall))
+        elif op is getattr(p, "ATOMIC_GROUP", None):
+            level = min(level, _bytes_fidelity(av, ignorecase, dotall))
+        else:
+            # Backreferences, conditionals and anything newer
+            return _BYTES_NEVER
+        if level == _BYTES_NEVER:
+            return level
+    return level
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_buffer_pattern(pattern: str):
+    """Compile pattern as UTF-8 bytes for scanning whole files without decoding.
+    Returns (regex, needs_ascii), where needs_ascii means the regex only finds
+    the same lines as the line-by-line search in pure-ASCII files, or None if
+    the pattern must always be searched line by line."""
+    regex = _compile_grep_pattern(pattern)
+    try:
+        parsed = _re_parser.parse(pattern)
+        level = _bytes_fidelity(
+            parsed.data, bool(regex.flags & re.IGNORECASE), bool(regex.flags & re.DOTALL)
+        )
+        if level == _BYTES_NEVER:
+            return None
+        return re.compile(pattern.encode("utf-8"), re.MULTILINE), level == _BYTES_ASCII_TEXT
+    except Exception:
+        # e.g. (?u), which bytes patterns reject; re's parser is internal as well
+        return None
+
+
+# Files containing any of these are searched line by line: they are the line
+# breaks str.splitlines() knows besides \n, plus \x1f, which str's \s matches
+# and bytes' \s does not
+_LINE_BY_LINE_BYTES = (b"\r", b"\x0b", b"\x0c", b"\x1c", b"\x1d", b"\x1e", b"\x1f",
+                       b"\xc2\x85", b"\xe2\x80\xa8", b"\xe2\x80\xa9")
+
+
+def _is_ascii(data) -> bool:
+    if not isinstance(data, mmap.mmap):
+        return data.isascii()
+    return all(data[i:i + _COUNT_CHUNK].isascii() for i in range(0, len(data), _COUNT_CHUNK))
+
+
+def _is_utf8(data) -> bool:
+    try:
+        str(data, "utf-8")
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def _grep_data(filepath: str, data, pattern: str, context: int,
+               results: list[str], limit: int) -> int:
+    """Search one file's bytes/mmap contents, appending one entry per matching
+    line (plus context) to results, with the same lines and numbering as
+    searching each line of the decoded text. Returns the number of matching lines."""
+    buffer_pattern = _compile_buffer_pattern(pattern)
+    if buffer_pattern is not None:
+        regex, needs_ascii = buffer_pattern
+        # Decoding drops invalid UTF-8, which can join, end or empty a line, so
+        # only files that decode unchanged are scanned as bytes
+        if _is_ascii(data) or (not needs_ascii and _is_utf8(data)):
+            # A memchr/memmem substring pass rules out most files far faster than the
+            # regex engine can when the pattern does not start with its literal part
+            literal = _required_literal(regex)
+            if literal is not None and data.find(literal) < 0:
+                return 0
+            if all(data.find(b) < 0 for b in _LINE_BY_LINE_BYTES):
+                return _grep_buffer(filepath, data, regex, context, results, limit)
+
+    regex = _compile_grep_pattern(pattern)
+    text = str(data, "utf-8", "ignore")
+    literal = _required_literal(regex)
+    if literal is not None and literal not in text:
+        return 0
+    return _grep_lines(filepath, text, regex, context, results, limit)
+
+
+def _grep_lines(filepath: str, text: str, regex: "re.Pattern", context: int,
+                results: list[str], limit: int) -> int:
+    """Search text one line at a time; same contract as _grep_buffer."""
+    lines = text.splitlines()
+    match_count = 0
+    for i, line in enumerate(lines):
+        if len(results) >= limit:
+            break
+        if regex.search(line) is None:
+            continue
+        match_count += 1
+        for j in range(max(0, i - context), min(len(lines), i + context + 1)):
+            prefix = ">" if j == i else " "
+            results.append(f"{filepath}:{j + 1}{prefix} {lines[j].rstrip()}")
+        if context:
+            results.append("--")
+    return match_count
+
+
+def _grep_buffer(filepath: str, data, regex: "re.Pattern", context: int,
+                 results: list[str], limit: int) -> int:
+    """Scan a whole bytes/mmap buffer with one bytes regex, appending one entry per
+    matching line (plus context) to results. Stops once results holds limit
+    lines. Returns the number of matching lines."""
+    nl = b"\n"
+    size = len(data)
+
+    def line_text(a: int, b: int) -> str:
+        # Strip ASCII whitespace before decoding so long padded lines decode less;
+        # the final rstrip still catches non-ASCII whitespace such as U+00A0
+        return data[a:b].rstrip().decode("utf-8", errors="ignore").rstrip()
+
+    match_count = 0
+    pos = 0
+    line_no = 0      # 0-based number of the line starting at line_pos
+    line_pos = 0
+    while pos < size and len(results) < limit:
+        m = regex.search(data, pos)
+        # An empty match after a trailing newline is not on a real line
+        if m is None or (m.start() == size and data[size - 1:] == nl):
+            break
+        start = data.rfind(nl, 0, m.start()) + 1
+        end = data.find(nl, m.start())
+        if end < 0:
+            end = size
+        # Patterns like \s can run past the newline; keep line-by-line semantics
+        # by re-checking the line on its own
+        if m.end() > end and regex.search(data, start, end) is None:
+            pos = end + 1
+            continue
+        line_no += _count_newlines(data, line_pos, start)
+        line_pos = start
+        match_count += 1
+
+        # Walk back/forward over at most `context` lines around the match
+        before = []
+        a = start
+        while a > 0 and len(before) < context:
+            prev = data.rfind(nl, 0, a - 1) + 1
+            before.append((prev, a - 1))
+            a = prev
+        for k, (a, b) in enumerate(reversed(before)):
+            results.append(f"{filepath}:{line_no - len(before) + k + 1}  {line_text(a, b)}")
+
+        results.append(f"{filepath}:{line_no + 1}> {line_text(start, end)}")
+
+        b = end
+        for k in range(context):
+            if b + 1 >= size:
+                break
+            a = b + 1
+            b = data.find(nl, a)
+            if b < 0:
+                b = size
+            results.append(f"{filepath}:{line_no + k + 2}  {line_text(a, b)}")
+
+        if context:
+            results.append("--")
+        # One hit per line: resume at the next line
+        pos = end + 1
+
+    return match_count
+
+
+# Process umask, read once, so new files get the same mode open() would give them
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    """Replace path's contents with data via a temporary file and a rename, so
+    the file is never left half-written. Symlinks are followed, and an
+    existing file keeps its permission bits. Files with other hard links, or
+    in a directory we cannot create files in, are rewritten in place instead,
+    since a rename would detach the links or is impossible."""
+    target = Path(os.path.realpath(path))
+    try:
+        st = os.stat(target)
+    except FileNotFoundError:
+        st = None
+
+    try:
+        if st is not None and (st.st_nlink > 1 or not os.access(target.parent, os.W_OK)):
+            with open(target, "wb") as f:
+                f.write(data)
+            return
+
+        # A unique hidden name, so no user file is ever clobbered
+        fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=f".{target.name}.", suffix=".tmp")
+        try:
+            try:
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(fd, view):]
+            finally:
+                os.close(fd)
+            # mkstemp creates files as 0600; give them the mode open() would have
+            os.chmod(tmp, stat.S_IMODE(st.st_mode) if st is not None else 0o666 & ~_UMASK)
+            os.replace(tmp, target)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    except OSError as e:
+        raise ToolError(f"Cannot write {target}: {e.strerror or e}")
 
 
 # ── Tool implementations ──────────────────────────────────────────────────────
@@ -30,8 +631,9 @@ def read_file(path: str, offset: Optional[int] = None,
     Optional offset/limit select a specific range of lines."""
     abs_path = Path(_resolve_path(path, config))
     try:
-        # keepends=True preserves original line endings for accurate line counting
-        lines = abs_path.read_text(encoding="utf-8", errors="replace").splitlines(keepends=True)
+        with abs_path.open("rb") as f:
+            # Only the requested window is ever decoded
+            data = _read_buffer(f)
     except FileNotFoundError:
         raise ToolError(f"File not found: {abs_path}")
     except PermissionError:
@@ -39,17 +641,33 @@ def read_file(path: str, offset: Optional[int] = None,
     except IsADirectoryError:
         raise ToolError(f"Is a directory: {abs_path}")
 
-    start = (offset - 1) if offset else 0
-    end = (start + limit) if limit else len(lines)
-    selected = lines[start:end]
+    try:
+        total = _count_lines(data)
+
+        start = (offset - 1) if offset else 0
+        end = (start + limit) if limit else total
 
-    result_lines = []
-    for i, line in enumerate(selected, start=start + 1):
-        result_lines.append(f"{i:>6}\u2192 {line.rstrip()}")
+        # Skip to the first requested line without decoding anything before it,
+        # then decode and split the selected window in one go
+        last = min(end, total)
+        pos = _line_offset(data, start)
+        stop = _line_offset(data, last - start, pos) if last > start else pos
+        window = data[pos:stop].decode("utf-8", errors="replace")
+        lines = window.removesuffix("\n").split("\n") if last > start else []
+        # Formatting every line dominates large reads. Driving the %-format through
+        # map() keeps the loop in C: about 10% faster than a list comprehension
+        # with an f-string
+        result_lines = list(map(
+            "%6d\u2192 %s".__mod__,
+            zip(itertools.count(start + 1), map(str.rstrip, lines)),
+        ))
+    finally:
+        if isinstance(data, mmap.mmap):
+            data.close()
 
-    header = f"File: {abs_path} ({len(lines)} lines total)"
+    header = f"File: {abs_path} ({total} lines total)"
     if offset or limit:
-        header += f" [showing lines {start + 1}-{min(end, len(lines))}]"
+        header += f" [showing lines {start + 1}-{min(end, total)}]"
     return header + "\n" + "\n".join(result_lines)
 
 
@@ -57,58 +675,145 @@ def write_file(path: str, content: str, config: Optional[Config] = None) -> str:
     """Write content to a file, creating parent directories if needed."""
     abs_path = Path(_resolve_path(path, config))
     abs_path.parent.mkdir(parents=True, exist_ok=True)
-    abs_path.write_text(content, encoding="utf-8")
-    # Count lines for the confirmation message
-    lines = content.count("\n") + (1 if content and not content.endswith("\n") else 0)
-    return f"Written {lines} lines to {abs_path}"
+    data = content.encode("utf-8")
+    _write_atomic(abs_path, data)
+    # Count lines for the confirmation message; bytes.count is a memchr scan
+    return f"Written {_count_lines(data)} lines to {abs_path}"
 
 
 def edit_file(path: str, old_string: str, new_string: str,
               config: Optional[Config] = None) -> str:
     """Replace an exact, unique string in a file with new_string.
-    Fails if old_string is not found or appears more than once."""
+    Fails if old_string is empty, not found, or appears more than once."""
     abs_path = Path(_resolve_path(path, config))
+    if not old_string:
+        raise ToolError(
+            "old_string is empty. Include the exact text to replace, "
+            "or use write_file to create or overwrite a whole file."
+        )
     try:
-        original = abs_path.read_text(encoding="utf-8")
+        # Work on raw bytes: no decode/re-encode of the whole file, and the
+        # file's own encoding and line endings are left untouched
+        original = abs_path.read_bytes()
     except FileNotFoundError:
         raise ToolError(f"File not found: {abs_path}")
 
-    count = original.count(old_string)
-    if count == 0:
+    old_bytes = old_string.encode("utf-8")
+    new_bytes = new_string.encode("utf-8")
+
+    # Locate the first occurrence and check uniqueness from there, instead of
+    # a full count() pass followed by a full replace() pass
+    index = original.find(old_bytes)
+    if index < 0 and b"\r\n" in original:
+        # The model writes "\n"; match a CRLF file in its own line endings
+        old_bytes = old_string.replace("\r\n", "\n").replace("\n", "\r\n").encode("utf-8")
+        new_bytes = new_string.replace("\r\n", "\n").replace("\n", "\r\n").encode("utf-8")
+        index = original.find(old_bytes)
+    if index < 0:
         raise ToolError(
             f"String not found in {abs_path}.\n"
             f"Make sure to use the exact characters including whitespace."
         )
-    if count > 1:
+    if original.find(old_bytes, index + len(old_bytes)) >= 0:
         # Ambiguous match — require more context so we edit the right place
         raise ToolError(
-            f"String appears {count} times in {abs_path} — cannot replace unambiguously. "
+            f"String appears {original.count(old_bytes)} times in {abs_path} — "
+            f"cannot replace unambiguously. "
             f"Include more context (surrounding lines) in old_string."
         )
 
-    new_content = original.replace(old_string, new_string, 1)
-    abs_path.write_text(new_content, encoding="utf-8")
+    _write_atomic(abs_path, original[:index] + new_bytes + original[index + len(old_bytes):])
+
+    return (
+        f"Edited {abs_path}: replaced {_count_lines(old_bytes)} lines "
+        f"with {_count_lines(new_bytes)} lines"
+    )
+
+
+# Anything that needs a real shell: pipes, redirection, expansion, globbing, etc.
+_SH_META = re.compile(r"[|&;<>$`\\*?(){}\[\]~!#\n]")
+
+
+def _descendants(pid: int) -> list[int]:
+    """Return the pids of all live descendants of pid, read from /proc.
+    Returns an empty list where /proc is unavailable."""
+    children: dict[int, list[int]] = {}
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return []
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "rb") as f:
+                # The command name may contain spaces; fields resume after ")"
+                ppid = int(f.read().rsplit(b")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
 
-    old_lines = old_string.splitlines()
-    new_lines = new_string.splitlines()
-    return f"Edited {abs_path}: replaced {len(old_lines)} lines with {len(new_lines)} lines"
+    found = []
+    stack = [pid]
+    while stack:
+        for child in children.get(stack.pop(), ()):
+            found.append(child)
+            stack.append(child)
+    return found
+
+
+def _run_command(args, timeout: int, **popen_kwargs) -> subprocess.CompletedProcess:
+    """Run a command and capture its output. The child stays in the terminal's
+    foreground process group, so Ctrl-C and tty prompts reach it as usual. On
+    timeout the command and all its descendants are killed, so background
+    children of a shell command are not left running."""
+    with subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          **popen_kwargs) as proc:
+        try:
+            stdout, stderr = proc.communicate(timeout=timeout)
+        except BaseException:
+            # Collect the tree before killing its root, which would orphan it
+            for pid in [proc.pid, *_descendants(proc.pid)]:
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+            # Popen.__exit__ closes the pipes and reaps the child
+            raise
+    return subprocess.CompletedProcess(args, proc.returncode, stdout, stderr)
 
 
 def bash(command: str, config: Optional[Config] = None) -> str:
-    """Run a shell command in the working directory and return its combined output."""
+    """Run a shell command in the working directory and return its combined output.
+    Simple commands are exec'd directly, skipping the extra /bin/sh process."""
     cwd = config.working_dir if config else Path.cwd()
     timeout = config.bash_timeout if config else 30
+    run_kwargs = dict(
+        text=True,
+        cwd=cwd,
+        # Path.home() only differs from the inherited environment when HOME is
+        # unset; otherwise pass env=None so no envp is rebuilt for each command
+        env=None if "HOME" in os.environ else {**os.environ, "HOME": str(Path.home())},
+    )
+
+    argv = None
+    if not _SH_META.search(command):
+        try:
+            argv = shlex.split(command)
+        except ValueError:
+            # Unbalanced quotes: let the shell report the error
+            pass
 
     try:
-        result = subprocess.run(
-            command,
-            shell=True,
-            capture_output=True,
-            text=True,
-            cwd=cwd,
-            timeout=timeout,
-            env={**os.environ, "HOME": str(Path.home())},
-        )
+        if argv:
+            try:
+                result = _run_command(argv, timeout, **run_kwargs)
+            except OSError:
+                # Not directly executable (builtin like cd/export, VAR=value prefix,
+                # a script without a shebang, ...): let the shell handle it
+                result = _run_command(command, timeout, shell=True, **run_kwargs)
+        else:
+            result = _run_command(command, timeout, shell=True, **run_kwargs)
     except subprocess.TimeoutExpired:
         raise ToolError(f"Command timed out after {timeout}s: {command}")
 
@@ -124,65 +829,304 @@ def bash(command: str, config: Optional[Config] = None) -> str:
     return "\n".join(output_parts) if output_parts else "[no output]"
 
 
-def grep(pattern: str, path: str = ".", glob_pattern: Optional[str] = None,
-         context: int = 0, config: Optional[Config] = None) -> str:
-    """Search files for a regex pattern and return matching lines with file:line references."""
-    base_path = Path(_resolve_path(path, config))
+# Upper bound on grep output lines; scanning stops once it is reached so a
+# very broad pattern cannot build an unbounded result in memory
+GREP_MAX_LINES = 10_000
 
-    if glob_pattern:
-        files = list(base_path.rglob(glob_pattern))
-    elif base_path.is_file():
-        files = [base_path]
-    else:
-        files = []
-        for p in base_path.rglob("*"):
-            if p.is_file():
-                # Skip hidden directories (e.g. .git, .venv)
-                if any(part.startswith(".") for part in p.relative_to(base_path).parts[:-1]):
-                    continue
-                files.append(p)
 
-        # Skip binary and generated file types that are unlikely to be useful
-        skip_exts = {
-            ".pyc", ".so", ".o", ".jpg", ".jpeg", ".png", ".gif",
-            ".pdf", ".zip", ".tar", ".gz", ".exe", ".bin", ".whl",
-        }
-        files = [f for f in files if f.suffix not in skip_exts]
+# Reads for grep run ahead of the regex scan on a small thread pool: file I/O
+# releases the GIL, so the next files load while the current ones are searched.
+# Files are loaded in batches to keep per-task overhead low on a warm cache,
+# and only a few batches are in flight to bound the contents held in memory.
+_GREP_READERS = 4
+_GREP_BATCH = 32
+_GREP_BATCHES_AHEAD = 4
+_grep_pool: Optional[ThreadPoolExecutor] = None
+_grep_pool_lock = threading.Lock()
+
 
+def _load_grep_file(filepath: str):
+    """Read one grep candidate, or return None if it cannot be read."""
     try:
-        regex = re.compile(pattern)
-    except re.error as e:
-        raise ToolError(f"Invalid regex pattern: {e}")
+        with open(filepath, "rb") as f:
+            # Let the C regex engine scan the whole file in one pass
+            return _read_buffer(f)
+    except (FileNotFoundError, PermissionError, IsADirectoryError):
+        # A cached candidate may have been removed since it was listed
+        return None
+
+
+def _load_grep_batch(batch: list[str]) -> list:
+    return [_load_grep_file(filepath) for filepath in batch]
+
+
+def _close_buffers(buffers: list) -> None:
+    for data in buffers:
+        if isinstance(data, mmap.mmap):
+            data.close()
+
+
+def _iter_grep_files(files: list[str]) -> Iterator[tuple[str, object]]:
+    """Yield (path, contents) in order while later batches load in the background.
+    Contents that are never consumed (e.g. when grep stops early) are closed."""
+    global _grep_pool
+    if len(files) <= _GREP_BATCH:
+        for filepath in files:
+            yield filepath, _load_grep_file(filepath)
+        return
+
+    with _grep_pool_lock:
+        if _grep_pool is None:
+            _grep_pool = ThreadPoolExecutor(_GREP_READERS, thread_name_prefix="grep-read")
+    batches = (files[i:i + _GREP_BATCH] for i in range(0, len(files), _GREP_BATCH))
+    pending = deque(
+        (batch, _grep_pool.submit(_load_grep_batch, batch))
+        for batch in itertools.islice(batches, _GREP_BATCHES_AHEAD)
+    )
+    try:
+        while pending:
+            batch, future = pending.popleft()
+            nxt = next(batches, None)
+            if nxt is not None:
+                pending.append((nxt, _grep_pool.submit(_load_grep_batch, nxt)))
+            buffers = future.result()
+            try:
+                for i, filepath in enumerate(batch):
+                    data, buffers[i] = buffers[i], None
+                    yield filepath, data
+            finally:
+                _close_buffers(buffers)
+    finally:
+        for _, future in pending:
+            if not future.cancel():
+                _close_buffers(future.result())
+
+
+# Large candidate lists are scanned on a process pool, since the regex scan
+# holds the GIL. Smaller ones stay in-process, where pool overhead would dominate.
+_GREP_PARALLEL_MIN = 256
+_grep_procs: Optional[ProcessPoolExecutor] = None
+_grep_procs_lock = threading.Lock()
+
+
+def _usable_cpus() -> int:
+    """CPUs this process may run on, which can be fewer than the machine has."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _init_grep_worker() -> None:
+    # Ctrl-C goes to the whole foreground process group; the REPL handles it
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _grep_process_pool() -> ProcessPoolExecutor:
+    global _grep_procs
+    with _grep_procs_lock:
+        if _grep_procs is None:
+            # Workers start from a clean forkserver process instead of forking this
+            # one, which runs reader and HTTP threads and installs its own handlers
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            _grep_procs = ProcessPoolExecutor(
+                _usable_cpus(), mp_context=context, initializer=_init_grep_worker
+            )
+        return _grep_procs
+
+
+def _grep_one(filepath: str, pattern: str, context: int, limit: int) -> list[str]:
+    """Scan a single file in a worker process; returns its formatted result lines.
+    The pool outlives any one pattern, so each worker compiles and analyses a
+    pattern once through the lru_caches behind _grep_data, not per file."""
+    data = _load_grep_file(filepath)
+    if data is None:
+        return []
+    results = []
+    try:
+        _grep_data(filepath, data, pattern, context, results, limit)
+    finally:
+        if isinstance(data, mmap.mmap):
+            data.close()
+    return results
+
+
+def _grep_parallel(files: list[str], pattern: str, context: int) -> tuple[int, list[str]]:
+    """Scan files across worker processes, merging per-file results in order.
+    Output, including where GREP_MAX_LINES cuts it off, matches the serial scan."""
+    pool = _grep_process_pool()
+    chunksize = max(1, len(files) // (4 * _usable_cpus()))
+
+    results = []
+    match_count = 0
+    per_file = pool.map(
+        _grep_one, files, itertools.repeat(pattern), itertools.repeat(context),
+        itertools.repeat(GREP_MAX_LINES), chunksize=chunksize,
+    )
+    for lines in per_file:
+        if len(results) + len(lines) <= GREP_MAX_LINES:
+            results.extend(lines)
+            match_count += len(lines) if not context else lines.count("--")
+            continue
+        # Replay match by match so the cut lands where the serial scan stops
+        i = 0
+        while i < len(lines) and len(results) < GREP_MAX_LINES:
+            j = lines.index("--", i) + 1 if context else i + 1
+            results.extend(lines[i:j])
+            match_count += 1
+            i = j
+        break
+    return match_count, results
+
+
+def _grep_python(pattern: str, base_path: Path, glob_pattern: Optional[str],
+                 context: int) -> tuple[int, list[str]]:
+    """Pure-Python grep backend; returns (match count, formatted result lines)."""
+    if not glob_pattern and base_path.is_file():
+        files = [str(base_path)]
+    else:
+        files = _cached_candidates(base_path, glob_pattern)
+
+    # Reject an invalid pattern before any file is read
+    _compile_grep_pattern(pattern)
+
+    if len(files) >= _GREP_PARALLEL_MIN and _usable_cpus() > 1:
+        return _grep_parallel(files, pattern, context)
 
     results = []
     match_count = 0
 
-    for filepath in sorted(files):
+    loaded = _iter_grep_files(files)
+    try:
+        for filepath, data in loaded:
+            if data is None:
+                continue
+            try:
+                match_count += _grep_data(filepath, data, pattern, context, results, GREP_MAX_LINES)
+            finally:
+                if isinstance(data, mmap.mmap):
+                    data.close()
+            if len(results) >= GREP_MAX_LINES:
+                break
+    finally:
+        loaded.close()
+
+    return match_count, results
+
+
+def _rg_text(field: dict) -> str:
+    """Decode a ripgrep JSON text field ({"text": ...} or base64 {"bytes": ...})."""
+    if "text" in field:
+        return field["text"]
+    return base64.b64decode(field["bytes"]).decode("utf-8", errors="ignore")
+
+
+def _grep_rg(pattern: str, base_path: Path, glob_pattern: Optional[str],
+             context: int) -> Optional[tuple[int, list[str]]]:
+    """ripgrep backend producing the same output as _grep_python.
+    Returns None when rg reports an error (e.g. a regex feature it does not
+    support), so the caller can fall back to the Python scanner."""
+    cmd = [_RG, "--json", "--no-config", "--no-ignore", "--hidden"]
+    if glob_pattern:
+        cmd += ["--glob", glob_pattern]
+    else:
+        # Same filtering as _walk_files: no hidden dirs, no skipped extensions
+        cmd += ["--glob", "!.*/"]
+        for ext in sorted(_SKIP_EXTS):
+            cmd += ["--glob", f"!*{ext}"]
+    if context:
+        cmd += ["--context", str(context)]
+    cmd += ["-e", pattern, "--", str(base_path)]
+
+    try:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    except OSError:
+        return None
+
+    # rg searches files on several threads and prints them in whatever order they
+    # finish, so every file is read before sorting and applying GREP_MAX_LINES.
+    # Output is parsed as it arrives rather than buffered whole.
+    # Per file: {line number: text} for match and context lines, plus match line numbers
+    per_file: dict[str, tuple[dict[int, str], list[int]]] = {}
+    has_output = False
+    with proc:
         try:
-            lines = filepath.read_text(encoding="utf-8", errors="ignore").splitlines()
-        except (PermissionError, IsADirectoryError):
-            continue
+            for raw in proc.stdout:
+                has_output = True
+                event = json.loads(raw)
+                kind = event["type"]
+                if kind != "match" and kind != "context":
+                    continue
+                data = event["data"]
+                lines, matches = per_file.setdefault(_rg_text(data["path"]), ({}, []))
+                line_no = data["line_number"]
+                lines[line_no] = _rg_text(data["lines"]).rstrip()
+                if kind == "match":
+                    matches.append(line_no)
+        finally:
+            # Don't leave rg running if the search is interrupted
+            if proc.poll() is None:
+                proc.kill()
+
+    # 0 = matches, 1 = no matches, 2 = error. An error with output means some
+    # files were unreadable but the search ran; only a failed start (e.g. a
+    # regex rg cannot parse) produces no output and needs the Python fallback.
+    if proc.returncode not in (0, 1) and not has_output:
+        return None
 
-        for i, line in enumerate(lines):
-            if regex.search(line):
-                match_count += 1
-                start = max(0, i - context)
-                end = min(len(lines), i + context + 1)
-                for j in range(start, end):
+    # rg merges overlapping context; re-expand it per match like the Python backend
+    results = []
+    match_count = 0
+    for path in sorted(per_file, key=_path_key):
+        lines, matches = per_file[path]
+        for i in matches:
+            if len(results) >= GREP_MAX_LINES:
+                return match_count, results
+            match_count += 1
+            for j in range(i - context, i + context + 1):
+                if j in lines:
                     prefix = ">" if j == i else " "
-                    results.append(f"{filepath}:{j + 1}{prefix} {lines[j].rstrip()}")
-                if context:
-                    results.append("--")
+                    results.append(f"{path}:{j}{prefix} {lines[j]}")
+            if context:
+                results.append("--")
+    return match_count, results
+
+
+def grep(pattern: str, path: str = ".", glob_pattern: Optional[str] = None,
+         context: int = 0, config: Optional[Config] = None) -> str:
+    """Search files for a regex pattern and return matching lines with file:line references.
+    Uses ripgrep when it is installed, otherwise a pure-Python scanner."""
+    base_path = Path(_resolve_path(path, config))
+
+    found = _grep_rg(pattern, base_path, glob_pattern, context) if _RG else None
+    if found is None:
+        found = _grep_python(pattern, base_path, glob_pattern, context)
+    match_count, results = found
 
     if not results:
         return f"No matches for pattern /{pattern}/"
-    return f"Found {match_count} match(es) for /{pattern}/\n" + "\n".join(results)
+    output = f"Found {match_count} match(es) for /{pattern}/\n" + "\n".join(results)
+    if len(results) >= GREP_MAX_LINES:
+        output += f"\n... (stopped after {GREP_MAX_LINES} lines; narrow the pattern or path)"
+    return output
 
 
 def glob_files(pattern: str, path: str = ".", config: Optional[Config] = None) -> str:
     """Find files matching a glob pattern and return their paths relative to the working dir."""
     base_path = Path(_resolve_path(path, config))
-    matches = sorted(base_path.glob(pattern))
+    name_re = _compile_glob(pattern)
+    if name_re is None:
+        matches = sorted(map(str, base_path.glob(pattern)), key=_path_key)
+    else:
+        # A plain name pattern only needs one directory listing; every match
+        # shares the same parent, so sorting the names sorts the paths
+        try:
+            with os.scandir(base_path) as entries:
+                names = sorted(e.name for e in entries if name_re.match(e.name))
+        except OSError:
+            names = []
+        matches = [os.path.join(base_path, name) for name in names]
 
     if not matches:
         return f"No files match pattern: {pattern} in {base_path}"
@@ -192,10 +1136,10 @@ def glob_files(pattern: str, path: str = ".", config: Optional[Config] = None) -
     for m in matches:
         try:
             # Show paths relative to cwd for readability
-            rel_matches.append(str(m.relative_to(cwd)))
+            rel_matches.append(str(Path(m).relative_to(cwd)))
         except ValueError:
             # Fall back to absolute path if outside the working dir
-            rel_matches.append(str(m))
+            rel_matches.append(m)
 
     return f"Found {len(matches)} file(s):\n" + "\n".join(rel_matches)
 
@@ -212,15 +1156,15 @@ TOOL_DISPATCH = {
 }
 
 
-def execute_tool(name: str, arguments: dict, config: Config) -> str:
-    """Look up and call the requested tool, returning its output or an error string."""
+def execute_tool(name: str, arguments: dict, config: Config) -> ToolResult:
+    """Look up and call the requested tool, returning its output or an error message."""
     fn = TOOL_DISPATCH.get(name)
     if fn is None:
-        return f"Error: Unknown tool '{name}'"
+        return ToolResult(False, f"Error: Unknown tool '{name}'")
     try:
-        return fn(**arguments, config=config)
+        return ToolResult(True, fn(**arguments, config=config))
     except ToolError as e:
-        return f"Error: {e}"
+        return ToolResult(False, f"Error: {e}")
     except TypeError as e:
         # Catches missing or unexpected keyword arguments
-        return f"Error: Wrong arguments for tool '{name}': {e}"
+        return ToolResult(False, f"Error: Wrong arguments for tool '{name}': {e}")
@@ -0,0 +1,93 @@
+import os
+import re
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import tools  # noqa: E402
+
+# name -> contents of the files searched by every pattern below
+FILES = {
+    "words.txt": "straße / voilà / café\n".encode("utf-8"),
+    "unicode.txt": "naïve approach\ncafé au lait\ncaf bar\n100 ٣ digits\nfoo\xa0\nKelvin K\nlong ſ\n".encode("utf-8"),
+    "crlf.txt": b"foo\r\nbar foo\r\n\r\nend\r\n",
+    "breaks.py": b"def a():\n    pass\n\x0c\ndef b():\n    x\x1fy\n\xc2\x85 z def\nlast\xe2\x80\xa8line def\n",
+    "empty_lines.txt": b"a\n\n\nb\n",
+    "invalid.dat": b"\xff\xfe\xfd",
+    "trailing.txt": b"xa\xff\na\xffb\nab\n",
+    "plain.py": b"import re\ndef foo(x):\n    return x.y\n\nclass Foo:\n    pass\n",
+    "no_newline.txt": b"last line def",
+}
+
+PATTERNS = [
+    "def", "^def", "def$", "foo$", "^$", "", "x*", "a$", "ab", r"\Afoo", r"end\Z",
+    r"na\w+ve", r"^\w+$", r"\bcaf\b", r"\B", r"caf.", r"\d+", r"\s+digits", r"x\sy",
+    "café", "[é]", "[ü]", "é+", r"caf\xe9", "[à-ÿ]", "(?i)kelvin k", "(?i)long s",
+    r'[^"]*"', r"[^=]*==", r"[^a]*b", r"\s*zz", r"\W*zz", r"foo(?=\s)", r"(?<!\s)f",
+    r"(\w)\1", r"(?s)foo.bar", r".*def", r"[^\n]*def",
+]
+
+
+def reference_grep(pattern: str, root: str, context: int) -> str:
+    """The original grep: each file decoded, split with splitlines() and
+    searched one line at a time."""
+    regex = re.compile(pattern)
+    results = []
+    match_count = 0
+    for name in sorted(os.listdir(root)):
+        filepath = os.path.join(root, name)
+        lines = Path(filepath).read_text(encoding="utf-8", errors="ignore").splitlines()
+        for i, line in enumerate(lines):
+            if not regex.search(line):
+                continue
+            match_count += 1
+            for j in range(max(0, i - context), min(len(lines), i + context + 1)):
+                prefix = ">" if j == i else " "
+                results.append(f"{filepath}:{j + 1}{prefix} {lines[j].rstrip()}")
+            if context:
+                results.append("--")
+    if not results:
+        return f"No matches for pattern /{pattern}/"
+    return f"Found {match_count} match(es) for /{pattern}/\n" + "\n".join(results)
+
+
+class PythonGrepTest(unittest.TestCase):
+    def setUp(self):
+        # Exercise the pure-Python backend even where ripgrep is installed
+        self._rg = tools._RG
+        tools._RG = None
+        self._dir = tempfile.TemporaryDirectory()
+        self.root = self._dir.name
+
+    def tearDown(self):
+        tools._RG = self._rg
+        self._dir.cleanup()
+
+    def test_matches_line_by_line_search(self):
+        for name, data in FILES.items():
+            Path(self.root, name).write_bytes(data)
+        for pattern in PATTERNS:
+            for context in (0, 2):
+                with self.subTest(pattern=pattern, context=context):
+                    self.assertEqual(
+                        tools.grep(pattern, self.root, context=context),
+                        reference_grep(pattern, self.root, context),
+                    )
+
+    def test_repeat_without_terminator_is_not_quadratic(self):
+        # Each failed attempt of a bytes regex like [^"]*" over the whole file
+        # used to rescan to the end of the file: minutes for this file
+        Path(self.root, "big.txt").write_text("k = 'value with some words in it'\n" * 20000)
+        for pattern in (r'[^"]*"', r"\s*zz", r"[^=]*=="):
+            with self.subTest(pattern=pattern):
+                start = time.perf_counter()
+                self.assertEqual(tools.grep(pattern, self.root), f"No matches for pattern /{pattern}/")
+                self.assertLess(time.perf_counter() - start, 5)
+
+
+if __name__ == "__main__":
+    unittest.main()